@@ -103,8 +103,9 @@ func main() {
             return
         }
 
-        // Set initial status
-        rdb.Set(ctx, "status:"+jobID, "queued", 24*time.Hour)
+        // Set initial status (status and result share one job:{id} hash)
+        rdb.HSet(ctx, "job:"+jobID, "status", "queued")
+        rdb.Expire(ctx, "job:"+jobID, 24*time.Hour)
 
         // Return the Ticket ID immediately
         c.JSON(http.StatusAccepted, gin.H{
@@ -118,7 +119,7 @@ func main() {
         jobID := c.Param("id")
 
         // 1. Get the authoritative STATUS first
-        status, err := rdb.Get(ctx, "status:"+jobID).Result()
+        status, err := rdb.HGet(ctx, "job:"+jobID, "status").Result()
         
         // Handle missing key: Job ID invalid or expired
         if err == redis.Nil {
@@ -134,7 +135,7 @@ func main() {
 
         // 3. If finished completed OR failed, attach the result data
         if status == "completed" || status == "failed" {
-            res, err := rdb.Get(ctx, "result:"+jobID).Result()
+            res, err := rdb.HGet(ctx, "job:"+jobID, "result").Result()
             if err == nil {
                 var resultJSON map[string]interface{}
                 json.Unmarshal([]byte(res), &resultJSON)
@@ -221,7 +222,8 @@ func main() {
 		}
 		jsonData, _ := json.Marshal(jobData)
 		rdb.RPush(ctx, "print_jobs", jsonData)
-		rdb.Set(ctx, "status:"+jobID, "queued", 24*time.Hour)
+		rdb.HSet(ctx, "job:"+jobID, "status", "queued")
+		rdb.Expire(ctx, "job:"+jobID, 24*time.Hour)
 
 		c.JSON(http.StatusAccepted, gin.H{"job_id": jobID, "message": "File uploaded"})
 	})
@@ -5,17 +5,84 @@ Compatible with Next.js web applications through REST API
 """
 
 import subprocess
+import bisect
+import sys
+import hashlib
+import mmap
 import os
-import uuid
+import threading
 import re
 import time
 import shutil
 import json
+from contextlib import suppress
 from datetime import datetime
 import math
 from typing import Dict, Optional, Tuple, Any
+import numpy as np
 import trimesh
 
+try:
+    import orjson
+except ImportError:  # keep working against a bare stdlib environment
+    orjson = None
+
+# Binary STL record layout: normal, 3 vertices, attribute byte count
+_STL_DTYPE = np.dtype([('n', '<3f4'), ('v', '<3f4', (3,)), ('attr', '<u2')])
+
+def _fast_stl_validate(stl_file: str) -> Optional[Tuple[np.ndarray, bool, float]]:
+    """
+    Validate a binary STL without trimesh: one frombuffer parse gives the
+    bounding-box dimensions, an edge-count check gives watertightness
+    (every undirected edge of a closed mesh appears exactly twice), and a
+    vectorized area sum gives the fraction of surface lying flat on Z-min
+    (used to decide whether Tweaker3 orientation is worth running).
+    Returns (dimensions, is_watertight, bottom_area_ratio), or None if the
+    file is not a well-formed binary STL (ASCII etc.) and the caller
+    should fall back.
+    """
+    with open(stl_file, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if len(mm) < 84 or mm[:5] == b'solid':
+                return None
+            n_tri = int.from_bytes(mm[80:84], 'little')
+            if n_tri == 0 or len(mm) != 84 + 50 * n_tri:
+                return None
+            # Copy the records out of the map before any further use:
+            # frombuffer views export a pointer into the mmap, and
+            # closing it with such a view alive raises BufferError.
+            tris = np.frombuffer(mm, dtype=_STL_DTYPE, count=n_tri, offset=84).copy()
+        finally:
+            mm.close()
+
+    verts = tris['v'].reshape(-1, 3)
+    dimensions = verts.max(axis=0) - verts.min(axis=0)
+
+    # Map identical vertex coordinates to shared ids, then count
+    # undirected edges: exactly two occurrences each <=> closed mesh
+    packed = np.ascontiguousarray(verts).view([('', verts.dtype)] * 3)
+    _, vert_ids = np.unique(packed, return_inverse=True)
+    faces = vert_ids.reshape(-1, 3)
+    edges = np.concatenate([faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]])
+    edges.sort(axis=1)
+    _, counts = np.unique(edges, axis=0, return_counts=True)
+    watertight = bool((counts == 2).all())
+
+    # Share of total surface area facing straight down: cross products
+    # give 2*area and the face normal direction at once
+    v0, v1, v2 = tris['v'][:, 0], tris['v'][:, 1], tris['v'][:, 2]
+    cross = np.cross(v1 - v0, v2 - v0)
+    double_areas = np.linalg.norm(cross, axis=1)
+    total_area = double_areas.sum()
+    if total_area > 0:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            normal_z = np.where(double_areas > 0, cross[:, 2] / double_areas, 0.0)
+        bottom_ratio = float(double_areas[normal_z < -0.95].sum() / total_area)
+    else:
+        bottom_ratio = 0.0
+    return dimensions, watertight, bottom_ratio
+
 # === CONFIGURATION ===
 CONFIG = {
     "paths": {
@@ -40,32 +107,155 @@ CONFIG = {
     }
 }
 
+# Precompiled patterns: compiled once at import instead of hitting the
+# re module's cache lookup on every job
+# G-code metadata is pure ASCII, so this matches raw bytes and only the
+# captured groups ever get decoded. Both metadata lines are folded into
+# one alternation so a single finditer pass over the footer collects
+# everything; lastgroup tells the caller which line matched.
+_RE_GCODE_META = re.compile(
+    rb'; estimated printing time \(normal mode\) = (?P<time>.+)'
+    rb'|; filament used \[mm\] = (?P<filament>[\d.]+)')
+_RE_UNPRINTABILITY = re.compile(r'Unprintability:\s*([\d.]+)')
+_RE_SUPPORT_PCT = re.compile(r'Support.*?([\d.]+)%', re.IGNORECASE)
+_RE_FILL_DENSITY = re.compile(r'^fill_density = \d+%', re.MULTILINE)
+_RE_FILL_PATTERN = re.compile(r'^fill_pattern = \w+', re.MULTILINE)
+_RE_TIME_PART = re.compile(r'(\d+)([dhms])')
+
+# CPython opens its descriptors non-inheritable (PEP 446), so children
+# never see them regardless of close_fds. On Linux we therefore skip the
+# close pass entirely — even the cheap close_range call buys nothing.
+# Other platforms keep the safe default: spawn semantics are less
+# uniform there, and the per-fd walk is the price of not leaking
+# anything that slipped through.
+_CLOSE_FDS = sys.platform != "linux"
+
+# Set SLICER_DEBUG=1 to capture and echo PrusaSlicer's progress output;
+# by default it goes to DEVNULL so megabytes of messages are never
+# buffered or decoded just to be thrown away
+_SLICER_DEBUG = bool(os.environ.get("SLICER_DEBUG"))
+
+# The sliced G-code exists only so ~200 bytes of metadata can be read back
+# out of it; on Linux it goes to tmpfs so those megabytes never touch the
+# physical disk. Docker defaults /dev/shm to 64 MB while a dense slice
+# can reach hundreds of MB, so tmpfs is only used when it has at least
+# 1 GiB free (docker-compose sets shm_size accordingly); otherwise the
+# regular temp dir is safer than an ENOSPC mid-slice.
+def _pick_gcode_tmpdir():
+    if os.path.isdir("/dev/shm"):
+        try:
+            stv = os.statvfs("/dev/shm")
+            if stv.f_bavail * stv.f_frsize >= 1 << 30:
+                return "/dev/shm"
+        except OSError:
+            pass
+    return "temp"
+
+_GCODE_TMPDIR = _pick_gcode_tmpdir()
+_TIME_MULTIPLIERS = {'d': 86400, 'h': 3600, 'm': 60, 's': 1}
+
+# Filament weight: grams = length_mm * K[material]. K folds together the
+# 1.75 mm filament cross-section (pi * r^2 with r = 0.0875 cm), the mm->cm
+# conversion (/10) and the material density in g/cm^3, so the per-call
+# work is one multiply and a dict lookup
+_WEIGHT_FACTOR = math.pi * 0.0875 ** 2 / 10
+_WEIGHT_K = {m: _WEIGHT_FACTOR * d for m, d in
+             {"PLA": 1.24, "PETG": 1.27, "ABS": 1.04, "TPU": 1.20}.items()}
+
+# Price-rounding dispatch table: bisect on the tier boundary finds the
+# rule directly instead of walking an if/elif ladder
+_PRICE_BREAKS = [5, 10, 20]
+_PRICE_RULES = (
+    lambda p: 4.90,                                        # under $5
+    lambda p: 9.90,                                        # under $10
+    lambda p: math.floor(p) - 0.10,                        # under $20
+    lambda p: max((math.floor(p / 5) * 5) - 0.10, 19.90),  # $20-$100
+    lambda p: (math.floor(p / 10) * 10) - 0.10,            # above $100
+)
+
 class QuotationEngine:
     """Advanced 3D printing quotation engine with STEP conversion, mesh validation, orientation, and pricing"""
     
     def __init__(self, config: Dict = None):
         self.config = config or CONFIG
-        # self.ensure_directories()
+        # Generated slicer configs keyed by (layer_height, infill) so repeat
+        # quotes with the same parameters skip the regex/rewrite round-trip
+        self._config_cache = {}
+        # Case-folded extension set: O(1) membership instead of scanning
+        # the mixed-case list in the config on every validation
+        self._supported_ext = frozenset(
+            ext.lower() for ext in self.config["printing"]["supported_formats"])
+        # Base config template is read once here; get_config_file renders
+        # from this string instead of re-opening cfg.ini on every quote
+        with open(self.config["paths"]["config_base"], 'r') as f:
+            self._config_template = f.read()
+        # Short content hash of the template, baked into generated config
+        # filenames so on-disk configs invalidate when cfg.ini changes
+        self._config_template_hash = hashlib.blake2b(
+            self._config_template.encode(), digest_size=6).hexdigest()
+        # Flat-base ratio of the mesh most recently validated; read by
+        # generate_quotation to decide whether Tweaker3 can be skipped
+        self._last_bottom_ratio = 0.0
+        # Snapshot of the environment handed to every child process, so
+        # each spawn skips rebuilding/copying os.environ
+        self._env = os.environ.copy()
+        # Paths written for the job currently being quoted; returned to
+        # the caller as result["artifacts"] so cleanup can target exactly
+        # these files instead of scanning the temp dir
+        self._artifacts = []
+        self.ensure_directories()
     
     def ensure_directories(self):
-        """Create necessary directories"""
+        """Create all working directories once, so hot-path writes skip
+        the per-call makedirs stat+mkdir round-trips."""
         for dir_name in ["output_dir", "upload_dir"]:
-            dir_path = self.config["paths"][dir_name]
-            os.makedirs(dir_path, exist_ok=True)
+            os.makedirs(self.config["paths"][dir_name], exist_ok=True)
+        for sub in ["quotations", "cache", "configs"]:
+            os.makedirs(os.path.join("temp", sub), exist_ok=True)
     
+    def _file_digest(self, file_path: str) -> str:
+        """Content hash of an input file (blake2b, read in 1 MiB chunks)"""
+        h = hashlib.blake2b(digest_size=16)
+        with open(file_path, 'rb') as f:
+            while chunk := f.read(1 << 20):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def _pipeline_cache_path(self, digest: str, material: str,
+                             layer_height: float, infill: int) -> str:
+        return os.path.join("temp", "cache", f"{digest}_{material}_{layer_height}_{infill}.json")
+
+    def _load_pipeline_cache(self, cache_path: str) -> Optional[Dict]:
+        """Load cached slicing results, or None if absent/unreadable"""
+        try:
+            with open(cache_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _store_pipeline_cache(self, cache_path: str, slicing_data: Dict, complexity: str):
+        """Persist slicing results; failures are non-fatal"""
+        try:
+            with open(cache_path, 'w') as f:
+                json.dump({"slicing_data": slicing_data, "complexity": complexity}, f)
+        except OSError as e:
+            print(f"⚠️ Warning: Could not write pipeline cache: {e}")
+
     def validate_model(self, file_path: str) -> Tuple[bool, str]:
         """Validate uploaded 3D model file"""
-        if not os.path.exists(file_path):
+        # One stat gives existence and size together
+        try:
+            file_size = os.stat(file_path).st_size
+        except (FileNotFoundError, NotADirectoryError):
             return False, "File not found"
-        
+
         file_ext = os.path.splitext(file_path)[1].lower()
-        if file_ext not in self.config["printing"]["supported_formats"]:
-            return False, f"Unsupported format {file_ext}. Supported: {self.config['printing']['supported_formats']}"
-        
-        file_size = os.path.getsize(file_path)
+        if file_ext not in self._supported_ext:
+            return False, f"Unsupported format {file_ext}. Supported: {sorted(self._supported_ext)}"
+
         if file_size == 0:
             return False, "File is empty"
-        
+
         return True, "Valid"
     
     def convert_step_to_stl(self, step_file: str, job_id: str) -> Tuple[Optional[str], str]:
@@ -85,8 +275,11 @@ class QuotationEngine:
         ]
         
         try:
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=self.config["printing"]["timeout"])
-            
+            # stdout is never used here; only stderr matters for diagnostics
+            result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                    text=True, timeout=self.config["printing"]["timeout"],
+                                    env=self._env, close_fds=_CLOSE_FDS)
+
             if result.returncode != 0:
                 error_msg = f"STEP conversion failed: {result.stderr}"
                 # print(f"❌ {error_msg}")
@@ -96,6 +289,7 @@ class QuotationEngine:
                 return None, "STEP conversion produced empty file"
             
             # print(f"✅ STEP conversion successful")
+            self._artifacts.append(stl_file)
             return stl_file, "Conversion successful"
             
         except Exception as e:
@@ -108,19 +302,36 @@ class QuotationEngine:
         Check dimensions but ALLOW non-watertight meshes (PrusaSlicer handles them).
         """
         try:
-            mesh = trimesh.load_mesh(stl_file)
-            
+            # Binary STL fast path: direct numpy parse, no trimesh graph
+            # structures. ASCII/odd files fall through to trimesh below.
+            try:
+                fast = _fast_stl_validate(stl_file)
+            except Exception:
+                fast = None
+            if fast is not None:
+                dimensions, watertight, bottom_ratio = fast
+            else:
+                mesh = trimesh.load_mesh(stl_file)
+                bounds = mesh.bounds
+                dimensions = bounds[1] - bounds[0]
+                watertight = mesh.is_watertight
+                total_area = mesh.area
+                if total_area > 0:
+                    down = mesh.face_normals[:, 2] < -0.95
+                    bottom_ratio = float(mesh.area_faces[down].sum() / total_area)
+                else:
+                    bottom_ratio = 0.0
+            self._last_bottom_ratio = bottom_ratio
+
             # Check dimensions (500mm limit)
-            bounds = mesh.bounds
-            dimensions = bounds[1] - bounds[0]
             max_dimension = 500.0
-            
+
             if any(dim > max_dimension for dim in dimensions):
                 return False, f"Model too large: {dimensions[0]:.1f}x{dimensions[1]:.1f}x{dimensions[2]:.1f}mm"
             
             # RELAXED VALIDATION: We return True even if not watertight
             # because PrusaSlicer is very good at repairing bad meshes.
-            if not mesh.is_watertight:
+            if not watertight:
                 print("⚠️ Warning: Mesh is not watertight (proceeding anyway)")
             
             return True, "Mesh valid (or repairable)"
@@ -167,13 +378,14 @@ class QuotationEngine:
         """
         # print(f"🔄 Orienting STL with Tweaker3 for job {job_id}")
         
-        # Tweaker3 modifies the file in place, so we'll work with a copy
+        # Tweaker3 accepts separate input/output paths, so it reads the
+        # original and writes the oriented copy itself — no need to
+        # duplicate a potentially huge STL with shutil.copy2 first
         oriented_stl = os.path.join("temp", f"{job_id}_oriented.stl")
-        shutil.copy2(stl_file, oriented_stl)
-        
+
         cmd = [
             self.config["paths"]["tweaker3"],
-            "-i", oriented_stl,
+            "-i", stl_file,
             "-o", oriented_stl,
             "-vb",
             "-x",
@@ -187,21 +399,50 @@ class QuotationEngine:
         }
         
         try:
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=self.config["printing"]["timeout"])
-            
-            # Store output for analysis
-            orientation_data["tweaker3_output"] = result.stdout
-            
+            # Stream Tweaker3's stdout as it runs instead of buffering its
+            # whole analysis dump; only the complexity-bearing lines are
+            # kept. A watchdog timer preserves the hard timeout the old
+            # subprocess.run call gave us against hung processes.
+            matched_lines = []
+            stderr_chunks = []
+            with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                  text=True, bufsize=1,
+                                  env=self._env, close_fds=_CLOSE_FDS) as proc:
+                watchdog = threading.Timer(self.config["printing"]["timeout"], proc.kill)
+                watchdog.start()
+                # stderr has to drain concurrently with the stdout loop:
+                # reading stdout to EOF while the child blocks on a full
+                # stderr pipe is the classic Popen deadlock, and it's
+                # only broken here by the watchdog killing the job
+                stderr_reader = threading.Thread(
+                    target=lambda: stderr_chunks.append(proc.stderr.read()),
+                    daemon=True)
+                stderr_reader.start()
+                try:
+                    for line in proc.stdout:
+                        if _RE_UNPRINTABILITY.search(line) or _RE_SUPPORT_PCT.search(line):
+                            matched_lines.append(line)
+                    returncode = proc.wait()
+                finally:
+                    watchdog.cancel()
+                stderr_reader.join(timeout=5)
+            stderr_output = stderr_chunks[0] if stderr_chunks else ""
+
+            # Store (only the relevant) output for analysis
+            tweaker_summary = "".join(matched_lines)
+            orientation_data["tweaker3_output"] = tweaker_summary
+
             # Parse complexity from Tweaker3 output
-            complexity = self.parse_tweaker3_complexity(result.stdout)
+            complexity = self.parse_tweaker3_complexity(tweaker_summary)
             orientation_data["complexity"] = complexity
-            
-            if result.returncode != 0:
-                error_msg = f"Tweaker3 orientation failed: {result.stderr}"
+
+            if returncode != 0:
+                error_msg = f"Tweaker3 orientation failed: {stderr_output}"
                 # print(f"⚠️ {error_msg}, using original orientation")
                 return stl_file, "Orientation failed, using original", orientation_data
             
             # print(f"✅ Orientation successful (Complexity: {complexity})")
+            self._artifacts.append(oriented_stl)
             return oriented_stl, "Orientation successful", orientation_data
             
         except Exception as e:
@@ -213,43 +454,38 @@ class QuotationEngine:
         """
         Generate a config file with the specified layer height and infill percentage.
         Reads a base config file and modifies the fill_density value dynamically.
+        Results are memoized per (layer_height, infill) for the engine's lifetime.
         Returns: path to temporary config file
         """
-        # Select base config based on layer height
-        # base_configs = {
-        #     0.2: "default_0.2_15.ini",
-        # }
-        
-        # base_config = base_configs.get(layer_height, "cfg.ini")
-        base_config = "cfg.ini"
-        
-        # Read the base config file
-        with open(base_config, 'r') as f:
-            content = f.read()
-        
+        cache_key = (layer_height, infill)
+        cached = self._config_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        # A previous run may have generated this config already; the
+        # template hash in the name guards against a stale cfg.ini render
+        output_file = os.path.join(
+            "temp", "configs",
+            f"cfg_{self._config_template_hash}_{layer_height}_{infill}.ini")
+        if os.path.exists(output_file):
+            self._config_cache[cache_key] = output_file
+            return output_file
+
+        # Render from the in-memory template loaded at engine init
+        content = self._config_template
+
         # Modify the fill_density line
-        content = re.sub(
-            r'^fill_density = \d+%',
-            f'fill_density = {infill}%',
-            content,
-            flags=re.MULTILINE
-        )
+        content = _RE_FILL_DENSITY.sub(f'fill_density = {infill}%', content)
         
         # Modify fill_pattern to rectilinear when infill is 100%
         if infill == 100:
-            content = re.sub(
-                r'^fill_pattern = \w+',
-                'fill_pattern = rectilinear',
-                content,
-                flags=re.MULTILINE
-            )
+            content = _RE_FILL_PATTERN.sub('fill_pattern = rectilinear', content)
         
-        # Write to a temporary config file
-        output_file = os.path.join("temp", f"config_{layer_height}_{infill}.ini")
-        os.makedirs("temp", exist_ok=True)
+        # Write the rendered config for this and future runs
         with open(output_file, 'w') as f:
             f.write(content)
-        
+
+        self._config_cache[cache_key] = output_file
         return output_file
     
     def parse_tweaker3_complexity(self, tweaker_output: str) -> str:
@@ -260,7 +496,7 @@ class QuotationEngine:
         """
         try:
             # Look for unprintability score in Tweaker3 output
-            unprintability_match = re.search(r'Unprintability:\s*([\d.]+)', tweaker_output)
+            unprintability_match = _RE_UNPRINTABILITY.search(tweaker_output)
             if unprintability_match:
                 unprintability = float(unprintability_match.group(1))
                 
@@ -273,7 +509,7 @@ class QuotationEngine:
                     return "high"
             
             # Look for alternative indicators (support volume, overhang area, etc.)
-            support_match = re.search(r'Support.*?([\d.]+)%', tweaker_output, re.IGNORECASE)
+            support_match = _RE_SUPPORT_PCT.search(tweaker_output)
             if support_match:
                 support_pct = float(support_match.group(1))
                 if support_pct < 10:
@@ -298,7 +534,7 @@ class QuotationEngine:
         """
         print(f"🔪 Slicing model (material: {material}, layer: {layer_height}mm, infill: {infill}%)")
         
-        gcode_path = os.path.join("temp", f"{job_id}.gcode")
+        gcode_path = os.path.join(_GCODE_TMPDIR, f"{job_id}.gcode")
         config_file = self.get_config_file(layer_height, infill)
         
         cmd = [
@@ -311,14 +547,18 @@ class QuotationEngine:
         
         try:
             result = subprocess.run(
-                cmd, 
-                capture_output=True, 
+                cmd,
+                stdout=subprocess.PIPE if _SLICER_DEBUG else subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
                 text=True,
                 encoding='utf-8',
                 errors='replace',
-                timeout=self.config["printing"]["timeout"]
+                timeout=self.config["printing"]["timeout"],
+                env=self._env,
+                close_fds=_CLOSE_FDS
             )
-            print(result.stdout)
+            if _SLICER_DEBUG:
+                print(result.stdout)
             
             if result.returncode != 0:
                 error_msg = f"Slicer failed: {result.stderr}"
@@ -329,31 +569,26 @@ class QuotationEngine:
             slicing_data = self.parse_gcode(gcode_path, material, layer_height, infill)
             print(f"✅ Slicing completed - {slicing_data.get('print_time', 'Unknown')} estimated")
             shutil.os.remove(gcode_path)  # Clean up gcode file
-            
-            # Clean up temporary config file
-            if os.path.exists(config_file):
-                os.remove(config_file)
-            
+
+            # Config file is kept: it's cached for reuse by later quotes
             return slicing_data
-            
+
         except Exception as e:
             error_msg = f"Slicing error: {str(e)}"
             # print(f"❌ {error_msg}")
-            
-            # Clean up temporary config file even on error
-            if os.path.exists(config_file):
-                os.remove(config_file)
-            
+            with suppress(FileNotFoundError):
+                os.unlink(gcode_path)
             return {"error": error_msg}
     
     def parse_gcode(self, gcode_path: str, material: str, layer_height: float, infill: int) -> Dict:
-        """Extract detailed information from generated G-code (reads last 500 lines for efficiency)"""
+        """Extract detailed information from generated G-code (scans the
+        last 256 KiB via mmap, with a 64 KiB head fallback)"""
         data = {
             "print_time": None,
             "print_time_seconds": 0,
-            "print_time_hours": 0
-            # "filament_used_mm": 0,
-            # "filament_used_grams": 0,
+            "print_time_hours": 0,
+            "filament_used_mm": 0,
+            "filament_used_grams": 0
             # "material": material,
             # "layer_height": layer_height,
             # "infill_percentage": infill,
@@ -361,26 +596,40 @@ class QuotationEngine:
         }
         
         try:
-            # Read only the last 500 lines where metadata is located (more efficient for large files)
-            with open(gcode_path, "r", encoding='utf-8', errors='replace') as f:
-                # Get file size and position to read last ~500 lines
-                f.seek(0, 2)  # Go to end of file
-                file_size = f.tell()
-                
-                # Estimate bytes per line (~100 chars average) and read more to ensure we get 500+ lines
-                bytes_to_read = min(file_size, 80000)  # Read ~80KB from end (should cover 500+ lines)
-                f.seek(max(0, file_size - bytes_to_read))
-                
-                # Read and join the content
-                content = f.read()
-                
-                # Extract print time
-                time_match = re.search(r'; estimated printing time \(normal mode\) = (.+)', content)
-                if time_match:
-                    time_str = time_match.group(1).strip()
-                    data["print_time"] = time_str
-                    data["print_time_seconds"] = self.parse_time_to_seconds(time_str)
-                    data["print_time_hours"] = round(data["print_time_seconds"] / 3600, 2)
+            # PrusaSlicer writes its metadata comments in the header/footer
+            # blocks, never mid-file. mmap the file and scan only the last
+            # 256 KiB (falling back to the first 64 KiB), so the bytes
+            # touched stay constant no matter how large the print is.
+            with open(gcode_path, "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    file_size = len(mm)
+                    content = mm[max(0, file_size - 262144):]
+
+                    # One pass collects both metadata lines; the header is
+                    # only consulted if the footer misses the print time.
+                    time_match = filament_match = None
+                    for m in _RE_GCODE_META.finditer(content):
+                        if m.lastgroup == 'time':
+                            time_match = m
+                        else:
+                            filament_match = m
+                        if time_match and filament_match:
+                            break
+                    if not time_match and file_size > 262144:
+                        time_match = _RE_GCODE_META.search(mm[:65536])
+                        if time_match and time_match.lastgroup != 'time':
+                            time_match = None
+
+                    if time_match:
+                        time_str = time_match.group('time').strip().decode('ascii', errors='replace')
+                        data["print_time"] = time_str
+                        data["print_time_seconds"] = self.parse_time_to_seconds(time_str)
+                        data["print_time_hours"] = round(data["print_time_seconds"] / 3600, 2)
+
+                    if filament_match:
+                        filament_mm = float(filament_match.group('filament'))
+                        data["filament_used_mm"] = filament_mm
+                        data["filament_used_grams"] = self.estimate_filament_weight(filament_mm, material)
                 
                 # # Extract filament usage
                 # filament_match = re.search(r'; filament used \[mm\] = ([\d.]+)', content)
@@ -409,31 +658,14 @@ class QuotationEngine:
         
         return data
     
+    def estimate_filament_weight(self, filament_mm: float, material: str) -> float:
+        """Estimate filament weight in grams from extruded length in mm"""
+        return round(filament_mm * _WEIGHT_K.get(material, _WEIGHT_K["PLA"]), 2)
+
     def parse_time_to_seconds(self, time_str: str) -> int:
-        """Convert time string like '2h 30m 45s' to seconds"""
-        total_seconds = 0
-        
-        # Handle day
-        day_match = re.search(r'(\d+)d', time_str)
-        if day_match:
-            total_seconds += int(day_match.group(1)) * 86400
-        
-        # Handle hours
-        hour_match = re.search(r'(\d+)h', time_str)
-        if hour_match:
-            total_seconds += int(hour_match.group(1)) * 3600
-        
-        # Handle minutes  
-        min_match = re.search(r'(\d+)m', time_str)
-        if min_match:
-            total_seconds += int(min_match.group(1)) * 60
-        
-        # Handle seconds
-        sec_match = re.search(r'(\d+)s', time_str)
-        if sec_match:
-            total_seconds += int(sec_match.group(1))
-        
-        return total_seconds
+        """Convert time string like '2h 30m 45s' to seconds (single pass)"""
+        return sum(int(n) * _TIME_MULTIPLIERS[unit]
+                   for n, unit in _RE_TIME_PART.findall(time_str))
     
     
     def round_price(self, price: float) -> float:
@@ -445,20 +677,10 @@ class QuotationEngine:
         - $20-$100: round down to nearest 5 - 0.1 (e.g., 48 → 44.90)
         - Above $100: round down to nearest 10 - 0.1 (e.g., 148 → 139.90)
         """
-        if price < 5:
-            return 4.90
-        elif price < 10:
-            return 9.90
-        elif price < 20:
-            # Round down to nearest int and subtract 0.1
-            return math.floor(price) - 0.10
-        elif price <= 100:
-            # Round down to nearest 5 and subtract 0.1
-            rounded_down = (math.floor(price / 5) * 5) - 0.10
-            return max(rounded_down, 19.90)  # Ensure it doesn't go below $19.90
-        else:
-            # Round down to nearest 10 and subtract 0.1
-            return (math.floor(price / 10) * 10) - 0.10
+        tier = bisect.bisect_right(_PRICE_BREAKS, price)
+        if tier == 3 and price > 100:
+            tier = 4
+        return _PRICE_RULES[tier](price)
     
     def calculate_pricing(self, slicing_data: Dict, complexity: str = "medium", 
                          material: str = "PLA", rush_order: bool = False) -> Dict:
@@ -529,6 +751,9 @@ class QuotationEngine:
         """
         Generate complete quotation with STEP conversion, mesh validation, orientation, slicing, and pricing
         Main entry point for the quotation engine
+
+        The returned dict always carries "artifacts": the temp files this
+        run created, for the caller to delete (or keep) as it sees fit.
         
         Workflow:
         1. Check if file is STEP/STP, convert to STL if needed
@@ -537,8 +762,19 @@ class QuotationEngine:
         4. Slice with specified parameters (layer height, infill)
         5. Calculate price using simplified formula
         """
+        self._artifacts = []
+        result = self._run_quotation(input_file, material, layer_height,
+                                     infill, rush_order, job_id)
+        result["artifacts"] = self._artifacts
+        return result
+
+    def _run_quotation(self, input_file: str, material: str,
+                       layer_height: float, infill: int,
+                       rush_order: bool, job_id: Optional[str]) -> Dict:
         if job_id is None:
-            job_id = str(uuid.uuid4())
+            # os.urandom is a single syscall; uuid4 layers UUID object
+            # construction and hex formatting on top of the same entropy
+            job_id = os.urandom(16).hex()
         
         print(f"🚀 Starting quotation generation for job {job_id}")
         print(f"📁 Input file: {input_file}")
@@ -555,6 +791,26 @@ class QuotationEngine:
                 "timestamp": datetime.now().isoformat()
             }
         
+        # Pipeline memo: the same file content with the same slicing
+        # parameters always produces the same slicing data, so repeat jobs
+        # (re-uploads, re-quotes with a different rush flag) skip the
+        # convert/validate/orient/slice subprocesses entirely.
+        cache_path = None
+        try:
+            digest = self._file_digest(input_file)
+            cache_path = self._pipeline_cache_path(digest, material, layer_height, infill)
+        except OSError as e:
+            print(f"⚠️ Warning: Could not hash input file: {e}")
+
+        if cache_path:
+            cached = self._load_pipeline_cache(cache_path)
+            if cached is not None:
+                print(f"♻️ Reusing cached slicing results for job {job_id}")
+                return self._finalize_quotation(
+                    cached["slicing_data"], cached["complexity"],
+                    material, layer_height, infill, rush_order, job_id
+                )
+
         # Step 1: Check if STEP/STP file and convert to STL
         file_ext = os.path.splitext(input_file)[1].lower()
         if file_ext not in [".stl", ".STL"]:
@@ -571,7 +827,11 @@ class QuotationEngine:
             stl_file = input_file
             conversion_performed = False
         
-        # Step 2: Validate mesh
+        # Step 2: Validate mesh. Validation is cheap now (vectorized
+        # binary-STL parse) and its by-product — the flat-base ratio —
+        # decides whether Tweaker3 needs to run at all, so it goes first;
+        # the thread overlap previously used here is pointless once the
+        # common case skips the subprocess entirely.
         mesh_valid, mesh_msg = self.check_mesh_validity(stl_file)
         if not mesh_valid:
             return {
@@ -580,9 +840,18 @@ class QuotationEngine:
                 "job_id": job_id,
                 "timestamp": datetime.now().isoformat()
             }
-        
-        # Step 3: Orient STL using Tweaker3
-        oriented_stl, orient_msg, orientation_data = self.orient_stl_with_tweaker3(stl_file, job_id)
+
+        # Step 3: Orient STL using Tweaker3 — unless the model already
+        # sits on a large flat face, in which case the orientation is
+        # already (near-)optimal and the subprocess spawn is saved
+        if self._last_bottom_ratio > 0.3:
+            print(f"⚡ Flat base detected ({self._last_bottom_ratio:.0%} of surface) - skipping orientation")
+            oriented_stl = stl_file
+            orient_msg = "skipped: flat base detected"
+            orientation_data = {"complexity": "low", "unprintability": 0, "tweaker3_output": ""}
+        else:
+            oriented_stl, orient_msg, orientation_data = self.orient_stl_with_tweaker3(stl_file, job_id)
+
         if oriented_stl is None:
             return {
                 "success": False,
@@ -590,7 +859,21 @@ class QuotationEngine:
                 "job_id": job_id,
                 "timestamp": datetime.now().isoformat()
             }
-        
+
+        # center_and_ground_model (below) rewrites its input in place.
+        # Whenever orientation handed back the caller's own file — the
+        # flat-base skip, or Tweaker3 failing and falling back to the
+        # original orientation — and no STEP conversion produced a
+        # job-local copy, centering would mutate the caller's file: in
+        # the worker a hardlink into the shared download cache, in the
+        # CLI the user's STL. Either way the content digest the quote
+        # caches key on would drift. Copy to a job-local file first.
+        if oriented_stl == stl_file and not conversion_performed:
+            centered_copy = os.path.join("temp", f"{job_id}_centered.stl")
+            shutil.copyfile(oriented_stl, centered_copy)
+            self._artifacts.append(centered_copy)
+            oriented_stl = centered_copy
+
         complexity = orientation_data.get("complexity", "medium")
         print(f"📊 Model complexity: {complexity}")
         # CENTER & GROUND (Crucial for fixing 'No Layers')
@@ -606,10 +889,20 @@ class QuotationEngine:
                 "job_id": job_id,
                 "timestamp": datetime.now().isoformat()
             }
-        
+
+        if cache_path:
+            self._store_pipeline_cache(cache_path, slicing_data, complexity)
+
         # Step 5: Calculate pricing
+        return self._finalize_quotation(slicing_data, complexity, material,
+                                        layer_height, infill, rush_order, job_id)
+
+    def _finalize_quotation(self, slicing_data: Dict, complexity: str,
+                            material: str, layer_height: float, infill: int,
+                            rush_order: bool, job_id: str) -> Dict:
+        """Price the slicing results and assemble the quotation payload"""
         pricing_data = self.calculate_pricing(slicing_data, complexity, material, rush_order)
-        
+
         quotation = {
             "success": True,
             "job_id": job_id,
@@ -660,25 +953,37 @@ class QuotationEngine:
         """Save quotation data to JSON file for record keeping"""
         try:
             quotations_dir = os.path.join("temp", "quotations")
-            os.makedirs(quotations_dir, exist_ok=True)
-            
             filename = f"{quotation['job_id']}_quotation.json"
             filepath = os.path.join(quotations_dir, filename)
             
-            with open(filepath, 'w') as f:
-                json.dump(quotation, f, indent=2)
+            with open(filepath, 'wb') as f:
+                if orjson is not None:
+                    f.write(orjson.dumps(quotation, option=orjson.OPT_INDENT_2))
+                else:
+                    f.write(json.dumps(quotation, indent=2).encode())
             
             print(f"📄 Quotation saved: {filename}")
         except Exception as e:
             print(f"⚠️ Warning: Could not save quotation: {e}")
 
 # CLI Interface for testing
+def _quote_one(input_file, material, layer_height, infill, rush_order):
+    """Top-level helper so ProcessPoolExecutor can pickle it (batch mode)"""
+    engine = QuotationEngine()
+    return engine.generate_quotation(
+        input_file=input_file,
+        material=material,
+        layer_height=layer_height,
+        infill=infill,
+        rush_order=rush_order
+    )
+
 def main():
     """Command line interface for testing the quotation engine"""
     import argparse
     
     parser = argparse.ArgumentParser(description="3D Printing Quotation Engine")
-    parser.add_argument("file", help="Path to STL/STEP/STP file")
+    parser.add_argument("file", nargs='+', help="Path to STL/STEP/STP file(s)")
     parser.add_argument("--material", default="PLA", choices=["PLA", "PETG", "ABS"], 
                        help="Printing material (default: PLA)")
     parser.add_argument("--layer", type=float, default=0.2, choices=[0.16, 0.2, 0.3],
@@ -689,13 +994,40 @@ def main():
     parser.add_argument("--json", action="store_true", help="Output JSON format")
     
     args = parser.parse_args()
-    
+
+    if len(args.file) > 1:
+        # Batch mode: each file is an independent pipeline dominated by its
+        # own PrusaSlicer/Tweaker3 subprocesses, so fan out across cores.
+        # Single-file runs keep the direct path to avoid pool start-up cost.
+        from concurrent.futures import ProcessPoolExecutor
+        from functools import partial
+
+        quote = partial(_quote_one, material=args.material, layer_height=args.layer,
+                        infill=args.infill, rush_order=args.rush)
+        with ProcessPoolExecutor(max_workers=min(len(args.file), os.cpu_count() or 1)) as executor:
+            results = list(executor.map(quote, args.file))
+
+        if args.json:
+            batch = dict(zip(args.file, results))
+            if orjson is not None:
+                print(orjson.dumps(batch, option=orjson.OPT_INDENT_2).decode())
+            else:
+                print(json.dumps(batch, indent=2))
+        else:
+            for path, result in zip(args.file, results):
+                if result["success"]:
+                    summary = result["summary"]
+                    print(f"{path}: ${summary['total_cost']} ({summary['print_time']}, {summary['complexity']})")
+                else:
+                    print(f"{path}: ❌ {result['error']}")
+        return
+
     # Create quotation engine
     engine = QuotationEngine()
     
     # Generate quotation
     result = engine.generate_quotation(
-        input_file=args.file,
+        input_file=args.file[0],
         material=args.material,
         layer_height=args.layer,
         infill=args.infill,
@@ -703,7 +1035,10 @@ def main():
     )
     
     if args.json:
-        print(json.dumps(result, indent=2))
+        if orjson is not None:
+            print(orjson.dumps(result, option=orjson.OPT_INDENT_2).decode())
+        else:
+            print(json.dumps(result, indent=2))
     else:
         # Pretty print results
         if result["success"]:
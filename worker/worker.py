@@ -1,132 +1,749 @@
-import glob
+import atexit
+import hashlib
+import logging
 import redis
 import json
 import os
+import queue
+import socket
+import tempfile
 import time
 import httpx
 import threading
-from http.server import HTTPServer, BaseHTTPRequestHandler
-import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+import select
+from urllib.parse import urlsplit
+from logging.handlers import QueueHandler, QueueListener
 
 from quotation_engine import QuotationEngine
 
+# orjson parses and serializes several times faster than the stdlib and
+# returns bytes that go straight into Redis; fall back transparently
+# when it isn't installed (mirrors quotation_engine).
+try:
+    import orjson
+    _loads = orjson.loads
+    _dumps = orjson.dumps
+except ImportError:
+    _loads = json.loads
+    def _dumps(obj):
+        return json.dumps(obj).encode()
+
+# Queued payloads have a fixed shape, so decode them straight into a
+# typed struct: msgspec validates and coerces every field in one C call,
+# replacing the per-job dict lookups and float()/int() conversions. The
+# fallback class keeps identical semantics when msgspec isn't installed.
+try:
+    import msgspec
+
+    class Job(msgspec.Struct):
+        id: str
+        download_url: str
+        material: str
+        layer_height: float = 0.2
+        infill: int = 15
+        rush: bool = False
+
+    _decode_job = msgspec.json.Decoder(Job).decode
+except ImportError:
+    class Job:
+        __slots__ = ("id", "download_url", "material", "layer_height", "infill", "rush")
+
+        def __init__(self, payload):
+            self.id = payload['id']
+            self.download_url = payload['download_url']
+            self.material = payload['material']
+            self.layer_height = float(payload.get('layer_height', 0.2))
+            self.infill = int(payload.get('infill', 15))
+            self.rush = bool(payload.get('rush', False))
+
+    def _decode_job(job_json):
+        return Job(_loads(job_json))
+
+# Writable scratch dir for downloads and slicer intermediates. Point
+# QUOTE_TMPDIR at a tmpfs mount (e.g. /dev/shm/quotes) to keep transient
+# files out of disk entirely. Created once here, never re-checked per job.
+TEMP_DIR = os.environ.get("QUOTE_TMPDIR", "/app/temp")
+os.makedirs(TEMP_DIR, exist_ok=True)
+
+# Log records are handed to a queue and written by a listener thread, so the
+# job loop never blocks on a synchronous stdout flush under load.
+_log_queue = queue.SimpleQueue()
+_log_listener = QueueListener(_log_queue, logging.StreamHandler())
+_log_listener.start()
+logger = logging.getLogger("worker")
+logger.setLevel(logging.INFO)
+logger.addHandler(QueueHandler(_log_queue))
+
+# Single shared HTTP client so repeat downloads (usually the same S3/CDN host)
+# reuse pooled keep-alive connections instead of paying a TCP+TLS handshake
+# per job.
+http_client = httpx.Client(
+    timeout=30.0,
+    follow_redirects=True,
+    limits=httpx.Limits(max_connections=64, max_keepalive_connections=16),
+)
+# Close keep-alive sockets cleanly on interpreter shutdown
+atexit.register(http_client.close)
+
+# Reject obviously unusable URLs before spending any network or disk I/O
+ALLOWED_EXT = frozenset({"stl", "step", "stp", "obj", "3mf"})
+MAX_DOWNLOAD_BYTES = int(os.environ.get("MAX_DOWNLOAD_BYTES", 500 * 1024 * 1024))
+
+# Completed downloads live here, keyed by URL hash; jobs get hardlinks
+# into TEMP_DIR so evicting a cache entry never pulls a file out from
+# under a job that is still slicing it.
+CACHE_DIR = os.path.join(TEMP_DIR, "downloads")
+os.makedirs(CACHE_DIR, exist_ok=True)
+DOWNLOAD_CACHE_BYTES = int(os.environ.get("DOWNLOAD_CACHE_BYTES", 2 * 1024 * 1024 * 1024))
+
+# How many queued jobs to claim per round-trip. Claimed jobs are marked
+# processing immediately and run on this worker only, so the batch must
+# stay near the local pipeline's capacity (one slicing plus a little
+# download prefetch): grabbing more just starves idle replicas to save
+# microseconds of RTT against minutes of slicing.
+JOB_BATCH = int(os.environ.get("JOB_BATCH", "2"))
+
+# Per-worker identity: claimed payloads park in this Redis list until
+# their terminal write lands. Container hostnames change whenever a
+# replica is recreated, so recovery must not depend on a worker coming
+# back under the same id — each worker heartbeats worker:alive:{id}
+# instead, and at startup any in-flight list without a live heartbeat
+# is requeued by whichever worker comes up next.
+WORKER_ID = os.environ.get("WORKER_ID", socket.gethostname())
+_INFLIGHT_KEY = f"inflight:{WORKER_ID}"
+_HEARTBEAT_KEY = f"worker:alive:{WORKER_ID}"
+
+def _heartbeat(r):
+    while True:
+        try:
+            r.set(_HEARTBEAT_KEY, "1", ex=90)
+        except Exception as e:
+            logger.error("Heartbeat failed: %s", e)
+        time.sleep(30)
+
+# Claim up to ARGV[1] jobs and mark each one processing in a single
+# server-side step, so a worker crash between pop and status write can
+# never leave a job queued-but-untracked. Lua can't block, so the main
+# loop only calls this when the queue is known to be warm and falls back
+# to a blocking pop when it comes up empty.
+_CLAIM_LUA = """
+local out = {}
+for i = 1, tonumber(ARGV[1]) do
+    local v = redis.call('LPOP', KEYS[1])
+    if not v then break end
+    redis.call('RPUSH', KEYS[2], v)
+    local ok, job = pcall(cjson.decode, v)
+    if ok and job['id'] then
+        local key = 'job:' .. job['id']
+        redis.call('HSET', key, 'status', 'processing')
+        redis.call('EXPIRE', key, 86400)
+    end
+    out[#out + 1] = v
+end
+return out
+"""
+
+# Deferred status writes must never clobber a terminal state: a fast job
+# (quote-cache hit, or a download rejected synchronously) can land its
+# completed/failed write inside the flusher's 10ms batching window, and
+# an unconditional HSET afterwards would freeze the job at "processing"
+# for the full TTL. The guard makes each flush a no-op once the job has
+# finished.
+_STATUS_GUARD_LUA = """
+local cur = redis.call('HGET', KEYS[1], 'status')
+if cur ~= 'completed' and cur ~= 'failed' then
+    redis.call('HSET', KEYS[1], 'status', ARGV[1])
+    redis.call('EXPIRE', KEYS[1], 86400)
+end
+"""
+
+def _sha256_file(path):
+    """Hash an on-disk file in 1 MiB chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def evict_download_cache():
+    """Bound the download cache by size, evicting least-recently-used
+    entries first. The budget is DOWNLOAD_CACHE_BYTES or half the free
+    space on the volume, whichever is smaller; cache hits refresh an
+    entry's mtime so hot models survive."""
+    try:
+        stv = os.statvfs(CACHE_DIR)
+        cap = min(DOWNLOAD_CACHE_BYTES, stv.f_bavail * stv.f_frsize // 2)
+        entries = []
+        total = 0
+        with os.scandir(CACHE_DIR) as it:
+            for e in it:
+                try:
+                    st = e.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, e.path))
+                total += st.st_size
+        if total <= cap:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            with suppress(OSError):
+                os.unlink(path)
+            total -= size
+            if total <= cap:
+                break
+    except OSError:
+        pass
+
+def sweep_stale_downloads(max_age=86400):
+    """Remove per-job download hardlinks older than max_age seconds."""
+    # scandir: one getdents pass with the mtime served from the cached
+    # DirEntry stat, and a C-level prefix compare instead of fnmatch
+    cutoff = time.time() - max_age
+    try:
+        entries = os.scandir(TEMP_DIR)
+    except OSError:
+        return
+    with entries:
+        for e in entries:
+            if e.name.startswith("dl-"):
+                try:
+                    if e.stat().st_mtime < cutoff:
+                        os.unlink(e.path)
+                except OSError:
+                    pass
+
+def sweep_orphan_artifacts(max_age=86400):
+    """Startup-only fallback: remove job artifacts leaked by a crash.
+    Live jobs delete their own artifact lists, so anything this old in
+    the temp root has no owner."""
+    cutoff = time.time() - max_age
+    try:
+        entries = os.scandir(TEMP_DIR)
+    except OSError:
+        return
+    with entries:
+        for e in entries:
+            if e.name.endswith((".stl", ".gcode")):
+                try:
+                    if e.stat().st_mtime < cutoff:
+                        os.unlink(e.path)
+                except OSError:
+                    pass
+
+def _splice_http_download(url, partial, max_bytes):
+    """Zero-copy fast path for large plain-HTTP downloads on Linux.
+
+    With no TLS in the way, response bytes can be spliced from the
+    socket through a pipe straight into the file without ever entering
+    userspace (sendfile can't read from a socket, so splice it is).
+    Returns bytes written, or None whenever the fast path doesn't apply
+    — redirects, chunked encoding, bodies under 10 MB, or any error —
+    so the caller falls back to httpx streaming.
+    """
+    parsed = urlsplit(url)
+    target = parsed.path or "/"
+    if parsed.query:
+        target += "?" + parsed.query
+    sock = None
+    fd = pr = pw = None
+    try:
+        # Host must carry a non-default port or a vhost-routing server
+        # can serve the wrong resource — which this path would then cache
+        # as the model's bytes
+        host_header = parsed.hostname
+        if parsed.port and parsed.port != 80:
+            host_header = f"{parsed.hostname}:{parsed.port}"
+        sock = socket.create_connection((parsed.hostname, parsed.port or 80), timeout=30)
+        sock.sendall((f"GET {target} HTTP/1.1\r\nHost: {host_header}\r\n"
+                      "Connection: close\r\n\r\n").encode("ascii"))
+
+        # Read just the header block; anything past it is body
+        buf = b""
+        while b"\r\n\r\n" not in buf:
+            chunk = sock.recv(65536)
+            if not chunk or len(buf) > 65536:
+                return None
+            buf += chunk
+        head, body = buf.split(b"\r\n\r\n", 1)
+        lines = head.split(b"\r\n")
+        if lines[0].split()[1:2] != [b"200"]:
+            return None
+        length = 0
+        for line in lines[1:]:
+            key, _, val = line.partition(b":")
+            if key.strip().lower() == b"content-length":
+                length = int(val)
+                break
+        # Only large, well-formed responses are worth skipping httpx for
+        if not 10 * 1024 * 1024 <= length <= max_bytes:
+            return None
+
+        fd = os.open(partial, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        os.posix_fallocate(fd, 0, length)
+        total = os.write(fd, body)
+        pr, pw = os.pipe()
+        # The connect timeout left the socket in non-blocking mode, so
+        # splice returns EAGAIN whenever the receive buffer momentarily
+        # drains — routine on a real network. Wait for readability and
+        # retry instead of bailing; an empty select window means the
+        # transfer stalled and the httpx path should take over.
+        while total < length:
+            if not select.select([sock], [], [], 30)[0]:
+                return None  # stalled transfer
+            try:
+                n = os.splice(sock.fileno(), pw, 1 << 20)
+            except BlockingIOError:
+                continue
+            if n == 0:
+                return None  # connection closed early: truncated body
+            moved = 0
+            while moved < n:
+                moved += os.splice(pr, fd, n - moved)
+            total += n
+        return total
+    except (OSError, IndexError, ValueError):
+        return None
+    finally:
+        for f in (pr, pw, fd):
+            if f is not None:
+                os.close(f)
+        if sock is not None:
+            sock.close()
+
 def download_file(url):
+    """
+    Download url to the temp dir.
+    Returns (file_path, sha256_hexdigest) or (None, None) on failure.
+    Files are named by a hash of the URL, so a re-submitted model is served
+    from disk without hitting the network again. The digest is computed
+    while streaming so caching costs no extra read.
+    """
     try:
+        if not url.startswith(("http://", "https://")):
+            logger.warning("Download rejected: unsupported URL scheme: %s", url)
+            return None, None
+
         path = url.split('?')[0]
         ext = path.split('.')[-1] if '.' in path else 'stl'
-        # Use absolute path to ensure we write to the writable temp dir
-        filename = f"/app/temp/{str(uuid.uuid4())}.{ext}"
-        
-        with httpx.Client() as client:
-            resp = client.get(url, timeout=30.0, follow_redirects=True)
-            resp.raise_for_status()
-            with open(filename, 'wb') as f:
-                f.write(resp.content)
-        return filename
+        if ext.lower() not in ALLOWED_EXT:
+            logger.warning("Download rejected: unsupported extension .%s", ext)
+            return None, None
+
+        # Content-addressed cache entry (by URL): identical submissions
+        # collide on purpose so the download can be skipped entirely.
+        # blake2b runs notably faster than sha256 and 16 bytes is plenty
+        # for a cache key.
+        url_key = hashlib.blake2b(url.encode(), digest_size=16).hexdigest()
+        cache_path = f"{CACHE_DIR}/{url_key}.{ext}"
+        # The link name is unique per call, not per URL: each job owns
+        # its link outright and unlinks it at cleanup without racing a
+        # concurrent job that fetched the same model.
+        filename = f"{TEMP_DIR}/dl-{url_key}-{os.urandom(4).hex()}.{ext}"
+
+        # Cache hit: refresh the LRU clock and hand the job a hardlink —
+        # an os.link syscall instead of a network fetch
+        try:
+            if os.stat(cache_path).st_size > 0:
+                os.utime(cache_path)
+                os.link(cache_path, filename)
+                return filename, _sha256_file(filename)
+        except FileNotFoundError:
+            pass
+
+        digest = hashlib.sha256()
+        # Stream straight to disk so large meshes never sit fully in RAM
+        # (resp.content would materialize the whole body as one bytes object).
+        # Write to a temp file first so an interrupted download is never
+        # mistaken for a complete cached copy. The name is unique per
+        # attempt: the prefetch pool can download the same URL from two
+        # jobs at once, and a shared .part would let the first rename
+        # publish an inode the other thread is still writing into.
+        # Whichever attempt finishes last wins the rename, atomically.
+        tmp_fd, partial = tempfile.mkstemp(dir=CACHE_DIR, suffix=".part")
+        os.close(tmp_fd)
+
+        # Zero-copy splice path for big unencrypted downloads; when it
+        # declines (or half-finishes), the httpx path below re-fetches
+        # and overwrites the .part from scratch.
+        if url.startswith("http://") and hasattr(os, "splice"):
+            total = _splice_http_download(url, partial, MAX_DOWNLOAD_BYTES)
+            if total:
+                os.replace(partial, cache_path)
+                os.link(cache_path, filename)
+                # The pages are still cache-hot, so hashing now is a
+                # memory-speed read, not a second disk pass
+                return filename, _sha256_file(filename)
+
+        try:
+            with http_client.stream("GET", url) as resp:
+                resp.raise_for_status()
+                # Cancel oversize transfers as early as possible: trust
+                # Content-Length when present, enforce the cap while
+                # streaming regardless.
+                declared = int(resp.headers.get("content-length", 0))
+                if declared > MAX_DOWNLOAD_BYTES:
+                    raise Exception(f"File too large: {declared} bytes (max {MAX_DOWNLOAD_BYTES})")
+                total = 0
+                # 1 MiB userspace buffer aligns write syscalls with the
+                # streamed chunk size; the fadvise hint tells the kernel
+                # this is a one-shot sequential write so it can drop
+                # pages behind us instead of polluting the cache. When
+                # the server declares a length, reserving it up front
+                # lets the filesystem lay the file out in one extent
+                # instead of growing it chunk by chunk.
+                fd = os.open(partial, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+                if declared > 0 and hasattr(os, 'posix_fallocate'):
+                    try:
+                        os.posix_fallocate(fd, 0, declared)
+                    except OSError:
+                        pass  # not every filesystem supports it
+                with os.fdopen(fd, 'wb', buffering=1 << 20) as f:
+                    if hasattr(os, 'posix_fadvise'):
+                        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                    for chunk in resp.iter_bytes(chunk_size=1 << 20):
+                        total += len(chunk)
+                        if total > MAX_DOWNLOAD_BYTES:
+                            raise Exception(f"File too large: exceeds {MAX_DOWNLOAD_BYTES} bytes")
+                        digest.update(chunk)
+                        f.write(chunk)
+                    if total < declared:
+                        # Server sent less than it declared; drop the
+                        # preallocated zero tail
+                        f.truncate()
+            os.replace(partial, cache_path)
+            os.link(cache_path, filename)
+        except Exception:
+            # unlink reports "already gone" via errno; no need for a
+            # separate exists() stat first
+            with suppress(FileNotFoundError):
+                os.unlink(partial)
+            raise
+        return filename, digest.hexdigest()
     except Exception as e:
-        print(f"Download failed: {e}")
-        return None
+        logger.error("Download failed: %s", e)
+        return None, None
+
+# Pre-encoded health response: the platform pings this endpoint constantly,
+# so skip per-request status-line/header formatting entirely.
+_HEALTH_RESPONSE = (
+    b"HTTP/1.0 200 OK\r\n"
+    b"Content-Type: text/plain\r\n"
+    b"Content-Length: 18\r\n"
+    b"Connection: close\r\n"
+    b"\r\n"
+    b"Worker is running!"
+)
+
+# Intermediate status updates are fire-and-forget: the job loop drops
+# them on this queue and a flusher thread batches them into pipelined
+# SETs, so bookkeeping never blocks the slice work. Terminal states
+# (completed/failed) are still written synchronously with the result.
+_status_q = queue.SimpleQueue()
+
+def _status_flusher(r):
+    guard = r.register_script(_STATUS_GUARD_LUA)
+    while True:
+        first = _status_q.get()
+        # Brief window so a burst of updates coalesces into one pipeline
+        time.sleep(0.01)
+        items = [first]
+        while True:
+            try:
+                items.append(_status_q.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            pipe = r.pipeline(transaction=False)
+            for job_id, status in items:
+                guard(keys=[f"job:{job_id}"], args=[status], client=pipe)
+            pipe.execute()
+        except Exception as e:
+            logger.error("Status flush failed: %s", e)
+
+# Per-job file cleanup runs on this queue's consumer thread so the job loop
+# can pull the next job without waiting on unlink syscalls. Items are the
+# exact artifact paths the engine reported for the job — no directory
+# scan needed.
+_cleanup_q = queue.Queue()
+
+def _cleanup_worker():
+    while True:
+        paths = _cleanup_q.get()
+        for f in paths:
+            with suppress(FileNotFoundError, PermissionError):
+                os.unlink(f)
+        _cleanup_q.task_done()
 
 def start_health_check_server():
     """
-    Starts a dummy HTTP server on port 7860 to satisfy Hugging Face's health check.
+    Minimal responder on port 7860 to satisfy Hugging Face's health check:
+    accept, drain the request, write the canned response, close. No HTTP
+    parser and no per-ping handler objects.
     """
-    class HealthHandler(BaseHTTPRequestHandler):
-        def do_GET(self):
-            self.send_response(200)
-            self.end_headers()
-            self.wfile.write(b"Worker is running!")
-        def log_message(self, format, *args):
-            pass # Suppress logs
-
-    server = HTTPServer(('0.0.0.0', 7860), HealthHandler)
-    print("🏥 Health check server listening on port 7860")
-    server.serve_forever()
+    srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    srv.bind(('0.0.0.0', 7860))
+    srv.listen(64)
+    logger.info("🏥 Health check server listening on port 7860")
+    while True:
+        conn, _ = srv.accept()
+        try:
+            conn.recv(1024)
+            conn.sendall(_HEALTH_RESPONSE)
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+def process_job(r, engine, job_json, mark_processing=True, download_future=None):
+    """Run one queued job end to end: download, quote, publish to Redis.
+
+    mark_processing=False means the claim path already set the status
+    server-side (Lua claim), so the client-side update is skipped.
+    download_future, when given, is the dispatcher's prefetched download
+    for this job; otherwise the file is fetched inline."""
+    job = _decode_job(job_json)
+    job_id = job.id
+    logger.info("Processing Job %s...", job_id)
+
+    if mark_processing:
+        _status_q.put((job_id, "processing"))
+
+    # Built once; reused by every write for this job
+    job_key = f"job:{job_id}"
+
+    artifacts = []
+    file_path = None
+    try:
+        # Download (or collect the dispatcher's prefetch)
+        if download_future is not None:
+            file_path, file_digest = download_future.result()
+        else:
+            file_path, file_digest = download_file(job.download_url)
+        if not file_path:
+            raise Exception("Failed to download file")
+
+        material = job.material
+        layer_height = job.layer_height
+        infill = job.infill
+        rush = job.rush
+
+        # Same file + same parameters = same quote; skip the whole
+        # slice pipeline if another job already computed it.
+        cache_key = f"quote_cache:{file_digest}:{material}:{layer_height}:{infill}:{rush}"
+        cached = r.get(cache_key)
+        if cached:
+            result = _loads(cached)
+            result["job_id"] = job_id
+            logger.info("♻️ Quote cache hit for job %s", job_id)
+        else:
+            # Slice
+            result = engine.generate_quotation(
+                input_file=file_path,
+                material=material,
+                layer_height=layer_height,
+                infill=infill,
+                rush_order=rush,
+                job_id=job_id
+            )
+            # Strip before caching/publishing: the paths are worker-local
+            artifacts = result.pop("artifacts", [])
+
+        if not result or not result.get("success"):
+             raise Exception(result.get("error", "Generation failed"))
+
+        # One pipeline flushes cache + job hash in a single network
+        # write; status and result live as fields of one job:{id} hash
+        # (one key header, one TTL timer) instead of two string keys
+        pipe = r.pipeline(transaction=False)
+        if not cached:
+            pipe.set(cache_key, _dumps(result), ex=86400)
+        pipe.hset(job_key, mapping={"status": "completed", "result": _dumps(result)})
+        pipe.expire(job_key, 86400)
+        pipe.lrem(_INFLIGHT_KEY, 1, job_json)
+        pipe.execute()
+        logger.info("✅ Job %s completed!", job_id)
+
+    except Exception as e:
+        logger.error("❌ Job %s failed: %s", job_id, e)
+        error_data = {"success": False, "error": str(e)}
+        pipe = r.pipeline(transaction=False)
+        pipe.hset(job_key, mapping={"status": "failed", "result": _dumps(error_data)})
+        pipe.expire(job_key, 86400)
+        pipe.lrem(_INFLIGHT_KEY, 1, job_json)
+        pipe.execute()
+
+    finally:
+        # The job's intermediates AND its private download hardlink are
+        # unlinked by the background thread so the next job starts
+        # immediately. Dropping the link releases nothing the cache
+        # still holds — the entry in CACHE_DIR keeps the bytes for reuse
+        # — but stops finished jobs from pinning evicted data on disk.
+        if file_path:
+            artifacts.append(file_path)
+        if artifacts:
+            _cleanup_q.put(artifacts)
+
+# Downloads for upcoming jobs run on this pool while the current job is
+# still slicing, so network wait overlaps compute.
+_dl_pool = ThreadPoolExecutor(max_workers=4)
+
+def _dispatcher(r, ready):
+    """Claim jobs and prefetch their downloads for the slicing loop.
+
+    Busy path: one Lua EVALSHA claims a batch, parks each payload on
+    the in-flight list and marks every job processing atomically. Idle
+    path: Lua can't block, so an empty claim falls through to a blocking
+    single-item BLMOVE into the in-flight list (plain BLPOP on servers
+    without it) and those jobs get their status set client-side. Each
+    claimed job's download is submitted immediately; the bounded ready
+    queue caps how far prefetch runs ahead."""
+    claim_jobs = r.register_script(_CLAIM_LUA)
+    use_blmove = True
+
+    while True:
+        try:
+            claimed = True
+            jobs = claim_jobs(keys=["print_jobs", _INFLIGHT_KEY], args=[JOB_BATCH])
+            if not jobs:
+                claimed = False
+                jobs = []
+                if use_blmove:
+                    try:
+                        # Single-RTT claim with durability: the payload
+                        # atomically moves to the in-flight list
+                        item = r.blmove("print_jobs", _INFLIGHT_KEY, 5, "LEFT", "RIGHT")
+                        if item:
+                            jobs = [item]
+                    except redis.exceptions.ResponseError:
+                        use_blmove = False
+                        logger.info("BLMOVE not supported by this Redis; falling back to BLPOP (no in-flight tracking on the idle path)")
+                if not use_blmove:
+                    popped = r.blpop("print_jobs", timeout=5)
+                    if popped:
+                        jobs = [popped[1]]
+
+            for job_json in jobs:
+                try:
+                    url = _decode_job(job_json).download_url
+                except Exception:
+                    url = None
+                fut = _dl_pool.submit(download_file, url) if url else None
+                ready.put((job_json, fut, claimed))
+
+        except Exception as e:
+            logger.error("Dispatcher error: %s", e)
+            time.sleep(1)
 
 def main():
     # 1. Start Health Check server FIRST
     # This prevents "Launch timed out" errors if Redis fails
     t = threading.Thread(target=start_health_check_server, daemon=True)
     t.start()
+
+    # Background file-cleanup consumer
+    threading.Thread(target=_cleanup_worker, daemon=True).start()
     
     # 2. Connect to Redis (Safely)
     REDIS_URL = os.getenv("REDIS_URL")
-    print(f"🔌 Connecting to Redis...")
+    logger.info("🔌 Connecting to Redis...")
     
+    # Pool tuning: TCP keepalives and periodic health checks keep idle
+    # cloud connections from dying silently and surfacing as mid-job
+    # errors; retry_on_timeout absorbs the odd dropped socket instead of
+    # failing the job that hit it.
+    redis_opts = {
+        "socket_keepalive": True,
+        "health_check_interval": 30,
+        "retry_on_timeout": True,
+        "max_connections": 16,
+        # Replies stay raw bytes: job payloads and cached quotes feed
+        # straight into orjson (which takes bytes), so decoding every
+        # reply to str would only add a UTF-8 round-trip per command.
+        "decode_responses": False,
+    }
+
     r = None
     while r is None:
         try:
             if REDIS_URL:
-                r = redis.from_url(REDIS_URL)
+                r = redis.from_url(REDIS_URL, **redis_opts)
             else:
-                r = redis.Redis(host="localhost", port=6379, db=0)
+                r = redis.Redis(host="localhost", port=6379, db=0, **redis_opts)
             r.ping() # Test connection
-            print("✅ Redis Connected!")
+            logger.info("✅ Redis Connected!")
         except Exception as e:
-            print(f"❌ Redis Connection Failed: {e}")
-            print("Retrying in 5 seconds...")
+            logger.error("❌ Redis Connection Failed: %s. Retrying in 5 seconds...", e)
             time.sleep(5) # Wait before retrying to avoid log spam
 
+    # Background status flusher and liveness heartbeat (need the
+    # connected client)
+    threading.Thread(target=_status_flusher, args=(r,), daemon=True).start()
+    threading.Thread(target=_heartbeat, args=(r,), daemon=True).start()
+
     # 3. Initialize Engine
     engine = QuotationEngine()
-    print("Worker started. Waiting for jobs...")
+    logger.info("Worker started. Waiting for jobs...")
+
+    # Requeue jobs stranded in any in-flight list whose owner stopped
+    # heartbeating — covers both our own previous incarnation (same id
+    # or not) and dead replicas that will never restart under their old
+    # hostname. Requeueing a list whose owner merely missed a beat only
+    # risks a duplicate run (at-least-once; its LREM then removes
+    # nothing), never a lost job.
+    try:
+        for key in r.scan_iter(match="inflight:*", count=100):
+            owner = key.decode().split(":", 1)[1]
+            if owner != WORKER_ID and r.exists(f"worker:alive:{owner}"):
+                continue
+            stale = r.lrange(key, 0, -1)
+            if stale:
+                pipe = r.pipeline(transaction=False)
+                for item in stale:
+                    pipe.rpush("print_jobs", item)
+                pipe.delete(key)
+                pipe.execute()
+                logger.info("Requeued %d in-flight job(s) from worker %s", len(stale), owner)
+    except Exception as e:
+        logger.error("In-flight requeue failed: %s", e)
+
+    # Drop stale download links and crash-leaked artifacts left over
+    # from a previous run, trim the download cache to budget, then
+    # repeat hourly
+    sweep_stale_downloads()
+    sweep_orphan_artifacts()
+    evict_download_cache()
+    last_sweep = time.time()
+
+    # Two-stage pipeline: the dispatcher thread claims jobs and prefetches
+    # their model files while this loop runs the CPU-bound slicing one job
+    # at a time (the engine drives a single slicer pipeline). Steady-state
+    # throughput becomes max(download, slice) instead of their sum.
+    ready = queue.Queue(maxsize=2)
+    threading.Thread(target=_dispatcher, args=(r, ready), daemon=True).start()
 
     while True:
         try:
-            # Blocking pop
-            _, job_json = r.blpop("print_jobs")
-            job = json.loads(job_json)
-            job_id = job['id']
-            print(f"Processing Job {job_id}...")
-
-            r.set(f"status:{job_id}", "processing", ex=86400)
-            
-            file_path = None
             try:
-                # Download
-                file_path = download_file(job['download_url'])
-                if not file_path:
-                    raise Exception("Failed to download file")
-
-                # Slice
-                result = engine.generate_quotation(
-                    input_file=file_path,
-                    material=job['material'],
-                    layer_height=float(job.get('layer_height', 0.2)),
-                    infill=int(job.get('infill', 15)),
-                    rush_order=job.get('rush', False),
-                    job_id=job_id
-                )
-
-                if not result or not result.get("success"):
-                     raise Exception(result.get("error", "Generation failed"))
-
-                r.set(f"result:{job_id}", json.dumps(result), ex=86400)
-                r.set(f"status:{job_id}", "completed", ex=86400)
-                print(f"✅ Job {job_id} completed!")
-
-            except Exception as e:
-                print(f"❌ Job {job_id} failed: {e}")
-                error_data = {"success": False, "error": str(e)}
-                r.set(f"result:{job_id}", json.dumps(error_data), ex=86400)
-                r.set(f"status:{job_id}", "failed", ex=86400)
-
-            finally:
-                # Cleanup
-                if file_path and os.path.exists(file_path):
-                    try:
-                        os.remove(file_path)
-                    except: pass
-                
-                # Clean up intermediate files using glob
-                # Ensure we target the specific temp dir
-                for f in glob.glob(f"/app/temp/*{job_id}*"):
-                    try:
-                        os.remove(f)
-                    except: pass
+                job_json, dl_future, claimed = ready.get(timeout=300)
+            except queue.Empty:
+                job_json = None
+
+            if job_json is not None:
+                process_job(r, engine, job_json,
+                            mark_processing=not claimed,
+                            download_future=dl_future)
+
+            if time.time() - last_sweep > 3600:
+                sweep_stale_downloads()
+                evict_download_cache()
+                last_sweep = time.time()
 
         except Exception as main_e:
-            print(f"Critical Worker Loop Error: {main_e}")
+            logger.error("Critical Worker Loop Error: %s", main_e)
             time.sleep(1)
 
 if __name__ == "__main__":